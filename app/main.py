@@ -1,65 +1,252 @@
-from fastapi import FastAPI, Request, Depends, UploadFile, Form
-from fastapi.responses import RedirectResponse, HTMLResponse, FileResponse
+from fastapi import FastAPI, Request, Depends, UploadFile, Form, Response
+from fastapi.responses import RedirectResponse, HTMLResponse, FileResponse, StreamingResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import select, text, func, delete
-from sqlalchemy.orm import selectinload
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.coder import PickleCoder
+from fastapi_cache.decorator import cache
+from sqlalchemy import select, text, func, delete, insert, update, table, column
+from sqlalchemy.orm import selectinload, raiseload
+from sqlalchemy.orm.attributes import set_committed_value
+from contextlib import asynccontextmanager
+import asyncio
+import functools
 import os
+import re
+import shutil
+import tempfile
 from typing import Optional, List
 import urllib.parse
+import ahocorasick
 import httpx
-from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
 import markdown2
 import csv
 import io
-import json
 
-from .db import engine, Base, get_session, DB_PATH
+import orjson
+
+from .db import engine, Base, get_session, session_factory, DB_PATH
 from .models import Topic, Bookmark
-from .parse_bookmarks import parse_bookmarks_html
+from .parse_bookmarks import iter_bookmark_rows, parse_bookmarks_html
+
+
+UA_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+}
+
+# Block-page markers compiled into one Aho-Corasick automaton so /preview
+# scans the page text once instead of one substring search per marker.
+_BLOCK_MARKERS = ahocorasick.Automaton()
+for _marker in ("attention required", "cloudflare", "blocked"):
+    _BLOCK_MARKERS.add_word(_marker, _marker)
+_BLOCK_MARKERS.make_automaton()
+del _marker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    FastAPICache.init(InMemoryBackend(), prefix="bm", coder=PickleCoder)
+    # Shared client: keep-alive pooling across all preview/check requests
+    app.state.http = httpx.AsyncClient(timeout=10, follow_redirects=True, headers=UA_HEADERS)
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
 
 
-app = FastAPI(title="Bookmark Organizer")
+app = FastAPI(title="Bookmark Organizer", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Monotonic version folded into every cache key; bumping it on writes
+# invalidates all cached pages without an async clear() round-trip.
+_cache_version = 0
+
+
+def invalidate_cache():
+    """Retire every cached page. The version bump invalidates keys for
+    readers already in flight; the store purge frees the memory —
+    InMemoryBackend only evicts an expired entry when its exact key is
+    read again, so superseded versions would otherwise pile up forever."""
+    global _cache_version
+    _cache_version += 1
+    try:
+        backend = FastAPICache.get_backend()
+    except AssertionError:  # cache not initialized yet (startup)
+        return
+    store = getattr(backend, "_store", None)
+    if store is not None:
+        store.clear()
+
+
+def no_db_session_key_builder(func, namespace="", *, request=None, response=None, args=(), kwargs=None):
+    """Cache key from the endpoint name and its query parameters only —
+    the injected DB session (and request object) must not leak into the key."""
+    params = {k: v for k, v in (kwargs or {}).items() if k not in ("session", "request")}
+    return f"{namespace}:v{_cache_version}:{func.__name__}:{sorted(params.items())!r}"
 
 BASE_DIR = os.path.dirname(__file__)
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
-# Jinja filter for favicon URL from bookmark URL
+# Explicit Jinja environment: compiled templates are cached to disk and
+# mtime re-checks are disabled, so renders skip parse + stat entirely.
+_JINJA_CACHE_DIR = os.path.join(tempfile.gettempdir(), "bookmarks_jinja_cache")
+os.makedirs(_JINJA_CACHE_DIR, exist_ok=True)
+templates = Jinja2Templates(
+    env=Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=select_autoescape(["html"]),
+        auto_reload=False,
+        cache_size=400,
+        bytecode_cache=FileSystemBytecodeCache(_JINJA_CACHE_DIR),
+    )
+)
+
+# Jinja filter for favicon URL from bookmark URL. Called once per rendered
+# bookmark, so skip the heavyweight urlsplit: a compiled regex covers the
+# scheme://host prefix of real-world bookmark URLs and lru_cache reuses
+# results across page renders.
+_HOST_RE = re.compile(r"^[a-z][a-z0-9+.-]*://([^/:?#]+)", re.I)
+
+
+def _host_of(url: str) -> str:
+    m = _HOST_RE.match(url or "")
+    return m.group(1).lower() if m else ""
+
+
+@functools.lru_cache(maxsize=8192)
 def favicon_from_url(url: str) -> str:
-    try:
-        host = urllib.parse.urlsplit(url).hostname or ""
-    except Exception:
-        host = ""
+    m = _HOST_RE.match(url or "")
+    host = m.group(1) if m else ""
     return f"https://www.google.com/s2/favicons?domain={host}&sz=32"
 
 templates.env.filters["favicon"] = favicon_from_url
 templates.env.filters["urlencode"] = lambda v: urllib.parse.quote_plus(str(v), safe="")
 
-# Create DB tables on startup
-Base.metadata.create_all(bind=engine)
-# Deduplicate existing bookmarks and ensure unique index (topic_id, url)
-with engine.begin() as conn:
-    # Remove duplicates keeping the smallest id per (topic_id, url)
-    conn.exec_driver_sql(
-        """
-        DELETE FROM bookmarks
-        WHERE id NOT IN (
-            SELECT MIN(id) FROM bookmarks GROUP BY topic_id, url
-        )
-        """
-    )
-    # Create the unique index after cleanup
-    conn.exec_driver_sql(
-        "CREATE UNIQUE INDEX IF NOT EXISTS idx_bookmarks_topic_url ON bookmarks (topic_id, url)"
-    )
+# Bump when the one-time migration block below gains a new step; each DB
+# records the epoch it has reached in PRAGMA user_version, so the expensive
+# scans (dedup DELETE, traversal backfill, FTS rebuild) run once, not on
+# every process start.
+SCHEMA_EPOCH = 2
+
+
+def run_startup_migrations():
+    """Create tables and bring the DB up to the current schema epoch.
+
+    Runs at process start and again after /restore, since a restored
+    backup may predate the FTS table, the composite indexes or the
+    user_version stamp."""
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        schema_version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+        if schema_version < 1:
+            # Remove duplicates keeping the smallest id per (topic_id, url)
+            conn.exec_driver_sql(
+                """
+                DELETE FROM bookmarks
+                WHERE id NOT IN (
+                    SELECT MIN(id) FROM bookmarks GROUP BY topic_id, url
+                )
+                """
+            )
+            # Create the unique index after cleanup
+            conn.exec_driver_sql(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_bookmarks_topic_url ON bookmarks (topic_id, url)"
+            )
+            # Add traversal_ids to DBs created before the column existed, then backfill
+            topic_cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(topics)")]
+            if "traversal_ids" not in topic_cols:
+                conn.exec_driver_sql("ALTER TABLE topics ADD COLUMN traversal_ids VARCHAR(255)")
+                conn.exec_driver_sql(
+                    "CREATE INDEX IF NOT EXISTS ix_topics_traversal_ids ON topics (traversal_ids)"
+                )
+            conn.exec_driver_sql(
+                """
+                WITH RECURSIVE paths(id, path) AS (
+                    SELECT id, '/' || id || '/' FROM topics WHERE parent_id IS NULL
+                    UNION ALL
+                    SELECT t.id, p.path || t.id || '/' FROM topics t JOIN paths p ON t.parent_id = p.id
+                )
+                UPDATE topics SET traversal_ids = (SELECT path FROM paths WHERE paths.id = topics.id)
+                WHERE traversal_ids IS NULL
+                """
+            )
+            # Full-text search mirror of bookmarks, kept in sync by triggers
+            conn.exec_driver_sql(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS bookmarks_fts USING fts5("
+                "title, url, content='bookmarks', content_rowid='id', tokenize='unicode61')"
+            )
+            conn.exec_driver_sql(
+                "CREATE TRIGGER IF NOT EXISTS bookmarks_fts_ai AFTER INSERT ON bookmarks BEGIN "
+                "INSERT INTO bookmarks_fts(rowid, title, url) VALUES (new.id, new.title, new.url); "
+                "END"
+            )
+            conn.exec_driver_sql(
+                "CREATE TRIGGER IF NOT EXISTS bookmarks_fts_ad AFTER DELETE ON bookmarks BEGIN "
+                "INSERT INTO bookmarks_fts(bookmarks_fts, rowid, title, url) "
+                "VALUES ('delete', old.id, old.title, old.url); "
+                "END"
+            )
+            conn.exec_driver_sql(
+                "CREATE TRIGGER IF NOT EXISTS bookmarks_fts_au AFTER UPDATE ON bookmarks BEGIN "
+                "INSERT INTO bookmarks_fts(bookmarks_fts, rowid, title, url) "
+                "VALUES ('delete', old.id, old.title, old.url); "
+                "INSERT INTO bookmarks_fts(rowid, title, url) VALUES (new.id, new.title, new.url); "
+                "END"
+            )
+            # Backfill the index from existing rows
+            conn.exec_driver_sql("INSERT INTO bookmarks_fts(bookmarks_fts) VALUES('rebuild')")
+            # Covering index for the title-ordered topic listing
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS idx_bookmarks_topic_lowertitle "
+                "ON bookmarks (topic_id, lower(title))"
+            )
+        if schema_version < 2:
+            # Epoch 2: composite lookup indexes replace the single-column ones.
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_topics_parent_name ON topics (parent_id, name)"
+            )
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_bookmarks_topic_id_id ON bookmarks (topic_id, id)"
+            )
+            conn.exec_driver_sql("DROP INDEX IF EXISTS ix_topics_parent_id")
+            conn.exec_driver_sql("DROP INDEX IF EXISTS ix_bookmarks_topic_id")
+        if schema_version < SCHEMA_EPOCH:
+            conn.exec_driver_sql(f"PRAGMA user_version={SCHEMA_EPOCH}")
+
+
+run_startup_migrations()
 
 
 # Helpers
+# Lightweight handle on the FTS5 virtual table for use in ORM selects
+bookmarks_fts = table("bookmarks_fts", column("rowid"), column("rank"))
+
+
+def fts_match_query(q: str) -> str:
+    """Turn free-form user input into a safe FTS5 prefix query."""
+    terms = [t.replace('"', '""') for t in q.split()]
+    return " ".join(f'"{t}"*' for t in terms if t)
+
+
+# The root topic never changes once created; remember its id so every
+# request stops re-querying it (session.get hits the identity map).
+_ROOT_TOPIC_ID: Optional[int] = None
+
+
 def get_root_topic(session):
+    global _ROOT_TOPIC_ID
+    if _ROOT_TOPIC_ID is not None:
+        root = session.get(Topic, _ROOT_TOPIC_ID)
+        if root is not None:
+            return root
+        _ROOT_TOPIC_ID = None  # e.g. DB restored from a backup
     root = session.execute(
         select(Topic).where(Topic.parent_id == None, Topic.name == "Minu kogud")
     ).scalar_one_or_none()
@@ -67,27 +254,77 @@ def get_root_topic(session):
         root = Topic(name="Minu kogud", parent_id=None)
         session.add(root)
         session.commit()
+    _ROOT_TOPIC_ID = root.id
     return root
 
 
-def ensure_topic_path(session, path):
-    # path: ["Elektroonika", "Mikrokontrollerid"]
-    parent = get_root_topic(session)
+def load_topic_tree(session, root_id):
+    """Load the whole subtree under root_id with a single recursive CTE.
+
+    Returns (topics_by_id, children_by_parent) with each Topic's `children`
+    collection pre-populated, so template walks never trigger lazy loads.
+    """
+    subtree_ids = session.execute(
+        text(
+            """
+            WITH RECURSIVE subtree(id) AS (
+                SELECT id FROM topics WHERE id = :root
+                UNION ALL
+                SELECT t.id FROM topics t JOIN subtree s ON t.parent_id = s.id
+            )
+            SELECT id FROM subtree
+            """
+        ),
+        {"root": root_id},
+    ).scalars().all()
+    topics = session.execute(
+        # any relationship not populated below must fail loudly, not lazy-load
+        select(Topic).where(Topic.id.in_(subtree_ids)).options(raiseload("*"))
+    ).scalars().all()
+    topics_by_id = {t.id: t for t in topics}
+    children_by_parent = {}
+    for t in topics:
+        children_by_parent.setdefault(t.parent_id, []).append(t)
+    for t in topics:
+        set_committed_value(t, "children", children_by_parent.get(t.id, []))
+    return topics_by_id, children_by_parent
+
+
+def load_topic_cache(session):
+    """Preload every (parent_id, name) -> id pair for import path resolution."""
+    return {
+        (parent_id, name): topic_id
+        for parent_id, name, topic_id in session.execute(
+            select(Topic.parent_id, Topic.name, Topic.id)
+        )
+    }
+
+
+def ensure_topic_path(session, path, topic_cache=None):
+    # path: ["Elektroonika", "Mikrokontrollerid"]; returns the leaf topic id
+    parent_id = get_root_topic(session).id
     # Normalize root label collision from Safari exports (e.g., 'Favorites')
     normalized_path = [n for n in path if n and n.strip().lower() not in {"favorites", "bookmarks", "bookmarks bar"}]
     for name in normalized_path:
+        if topic_cache is not None and (parent_id, name) in topic_cache:
+            parent_id = topic_cache[(parent_id, name)]
+            continue
         existing = session.execute(
-            select(Topic).where(Topic.parent_id == parent.id, Topic.name == name)
+            select(Topic.id).where(Topic.parent_id == parent_id, Topic.name == name)
         ).scalar_one_or_none()
-        if not existing:
-            existing = Topic(name=name, parent_id=parent.id)
-            session.add(existing)
-            session.commit()
-        parent = existing
-    return parent
+        if existing is None:
+            topic = Topic(name=name, parent_id=parent_id)
+            session.add(topic)
+            session.flush()  # assign the id; callers commit once at the end
+            existing = topic.id
+        if topic_cache is not None:
+            topic_cache[(parent_id, name)] = existing
+        parent_id = existing
+    return parent_id
 
 
 @app.get("/", response_class=HTMLResponse)
+@cache(expire=60, key_builder=no_db_session_key_builder)
 def index(
     request: Request,
     session=Depends(get_session),
@@ -101,43 +338,52 @@ def index(
 ):
     root = get_root_topic(session)
 
-    # load full tree (children relation used in template)
-    def fetch_children(t: Topic):
-        session.refresh(t)
-        for child in t.children:
-            fetch_children(child)
-
-    fetch_children(root)
+    # load full tree in one recursive-CTE pass (children used in template)
+    topics_by_id, children_by_parent = load_topic_tree(session, root.id)
+    root = topics_by_id[root.id]
 
     # determine current topic
-    if topic_id:
-        current = session.get(Topic, topic_id) or root
+    if topic_id and topic_id in topics_by_id:
+        current = topics_by_id[topic_id]
     else:
         # Default to root so root-level import links are visible immediately
         current = root
 
-    # bookmarks for current topic (with optional search)
-    def collect_bookmarks(t: Topic):
-        items = list(t.bookmarks)
-        if include_sub:
-            for ch in t.children:
-                items.extend(collect_bookmarks(ch))
-        return items
+    # bookmarks for current topic (optionally the whole subtree) in one query
+    if include_sub and current.traversal_ids:
+        stmt = (
+            select(Bookmark)
+            .join(Topic, Bookmark.topic_id == Topic.id)
+            .where(Topic.traversal_ids.like(f"{current.traversal_ids}%"))
+        )
+    else:
+        stmt = select(Bookmark).where(Bookmark.topic_id == current.id)
+    stmt = stmt.options(raiseload("*"))
 
-    bookmarks = collect_bookmarks(current)
     if q:
-        ql = q.lower()
-        bookmarks = [
-            b
-            for b in bookmarks
-            if ql in (b.title or "").lower() or ql in (b.url or "").lower()
-        ]
+        match = fts_match_query(q)
+        if match:
+            stmt = (
+                stmt.join(bookmarks_fts, bookmarks_fts.c.rowid == Bookmark.id)
+                .where(text("bookmarks_fts MATCH :fts_match"))
+                .params(fts_match=match)
+            )
+
     if domain:
-        d = domain.lower().strip()
-        bookmarks = [b for b in bookmarks if urllib.parse.urlsplit(b.url or "").hostname and d in urllib.parse.urlsplit(b.url or "").hostname.lower()]
+        # Coarse SQL prefilter with LIKE metacharacters escaped; the exact
+        # host-only match happens below, since plain LIKE over the whole
+        # URL would also hit path/query text.
+        like = domain.lower().strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        stmt = stmt.where(func.lower(Bookmark.url).like(f"%{like}%", escape="\\"))
 
     # sort by title for more variety when duplicates existed previously
-    bookmarks = sorted(bookmarks, key=lambda b: (b.title or "").lower())
+    stmt = stmt.order_by(func.lower(Bookmark.title))
+
+    bookmarks = session.execute(stmt).scalars().all()
+
+    if domain:
+        d = domain.lower().strip()
+        bookmarks = [b for b in bookmarks if d in _host_of(b.url)]
 
     return templates.TemplateResponse(
         "topic.html",
@@ -163,6 +409,7 @@ def create_topic(
     parent_id: Optional[int] = Form(None),
     session=Depends(get_session),
 ):
+    invalidate_cache()
     parent = session.get(Topic, parent_id) if parent_id else get_root_topic(session)
     t = Topic(name=name.strip() or "Uus kaust", parent_id=parent.id if parent else None)
     session.add(t)
@@ -172,6 +419,7 @@ def create_topic(
 
 @app.post("/topics/rename/{topic_id}")
 def rename_topic(topic_id: int, name: str = Form(...), session=Depends(get_session)):
+    invalidate_cache()
     t = session.get(Topic, topic_id)
     if t:
         t.name = name.strip() or t.name
@@ -179,12 +427,34 @@ def rename_topic(topic_id: int, name: str = Form(...), session=Depends(get_sessi
     return RedirectResponse(url=f"/?topic_id={topic_id}", status_code=303)
 
 
+def rebase_topic_subtree(session, topic, new_parent):
+    """Re-parent topic under new_parent and rewrite its whole subtree's
+    traversal_ids with one prefix replacement, preserving the invariant
+    that subtree queries and export ordering depend on."""
+    old_prefix = topic.traversal_ids or f"/{topic.id}/"
+    new_prefix = f"{new_parent.traversal_ids}{topic.id}/"
+    topic.parent = new_parent
+    session.execute(
+        text(
+            "UPDATE topics SET traversal_ids = :new || substr(traversal_ids, :cut) "
+            "WHERE traversal_ids LIKE :old_like"
+        ),
+        {"new": new_prefix, "cut": len(old_prefix) + 1, "old_like": f"{old_prefix}%"},
+    )
+
+
 @app.post("/topics/delete/{topic_id}")
 def delete_topic(topic_id: int, session=Depends(get_session)):
+    invalidate_cache()
     t = session.get(Topic, topic_id)
     root = get_root_topic(session)
     if t and t.id != root.id:
         parent_id = t.parent_id or root.id
+        # Hand subfolders to the deleted topic's parent; leaving them to be
+        # silently re-rooted would strand stale traversal_ids paths.
+        new_parent = session.get(Topic, parent_id)
+        for child in list(t.children):
+            rebase_topic_subtree(session, child, new_parent)
         session.delete(t)
         session.commit()
         return RedirectResponse(url=f"/?topic_id={parent_id}", status_code=303)
@@ -196,6 +466,7 @@ def delete_topic(topic_id: int, session=Depends(get_session)):
 def create_bookmark(
     title: str = Form(...), url: str = Form(...), topic_id: int = Form(...), session=Depends(get_session)
 ):
+    invalidate_cache()
     b = Bookmark(title=title.strip() or url, url=url.strip(), topic_id=topic_id)
     session.add(b)
     session.commit()
@@ -204,6 +475,7 @@ def create_bookmark(
 
 @app.post("/bookmarks/delete/{bookmark_id}")
 def delete_bookmark(bookmark_id: int, session=Depends(get_session)):
+    invalidate_cache()
     b = session.get(Bookmark, bookmark_id)
     topic_id = b.topic_id if b else None
     if b:
@@ -214,6 +486,7 @@ def delete_bookmark(bookmark_id: int, session=Depends(get_session)):
 
 @app.post("/bookmarks/move/{bookmark_id}")
 def move_bookmark(bookmark_id: int, target_topic_id: int = Form(...), session=Depends(get_session)):
+    invalidate_cache()
     b = session.get(Bookmark, bookmark_id)
     if b and session.get(Topic, target_topic_id):
         b.topic_id = target_topic_id
@@ -224,76 +497,88 @@ def move_bookmark(bookmark_id: int, target_topic_id: int = Form(...), session=De
 
 @app.post("/bookmarks/bulk_delete")
 def bulk_delete(ids: str = Form(...), current_topic_id: int = Form(...), session=Depends(get_session)):
+    invalidate_cache()
     id_list = [int(x) for x in ids.split(",") if x.strip().isdigit()]
-    for bid in id_list:
-        b = session.get(Bookmark, bid)
-        if b:
-            session.delete(b)
-    session.commit()
+    if id_list:
+        session.execute(delete(Bookmark).where(Bookmark.id.in_(id_list)))
+        session.commit()
     return RedirectResponse(url=f"/?topic_id={current_topic_id}", status_code=303)
 
 
 @app.post("/bookmarks/bulk_move")
 def bulk_move(ids: str = Form(...), target_topic_id: int = Form(...), current_topic_id: int = Form(...), session=Depends(get_session)):
+    invalidate_cache()
     id_list = [int(x) for x in ids.split(",") if x.strip().isdigit()]
     if not session.get(Topic, target_topic_id):
         return RedirectResponse(url=f"/?topic_id={current_topic_id}", status_code=303)
-    for bid in id_list:
-        b = session.get(Bookmark, bid)
-        if b:
-            b.topic_id = target_topic_id
-    session.commit()
+    if id_list:
+        session.execute(
+            update(Bookmark)
+            .where(Bookmark.id.in_(id_list))
+            .values(topic_id=target_topic_id)
+        )
+        session.commit()
     return RedirectResponse(url=f"/?topic_id={target_topic_id}", status_code=303)
 
 
 @app.post("/topics/move/{topic_id}")
 def move_topic(topic_id: int, target_parent_id: int = Form(...), session=Depends(get_session)):
+    invalidate_cache()
     t = session.get(Topic, topic_id)
     target = session.get(Topic, target_parent_id)
     root = get_root_topic(session)
     if not t or not target or t.id == root.id or target.id == t.id:
         return RedirectResponse(url=f"/?topic_id={t.id if t else root.id}", status_code=303)
-    # prevent moving under own descendant
-    anc = target
-    while anc:
-        if anc.id == t.id:
-            return RedirectResponse(url=f"/?topic_id={t.id}", status_code=303)
-        anc = session.get(Topic, anc.parent_id) if anc.parent_id else None
-    t.parent_id = target.id
+    # prevent moving under own descendant: ancestor == path prefix
+    if (target.traversal_ids or "").startswith(t.traversal_ids or f"/{t.id}/"):
+        return RedirectResponse(url=f"/?topic_id={t.id}", status_code=303)
+    rebase_topic_subtree(session, t, target)
     session.commit()
     return RedirectResponse(url=f"/?topic_id={t.id}", status_code=303)
 
 
 # Import & Export
+def load_existing_bookmark_keys(session):
+    """All (topic_id, url) pairs already in the DB, for in-memory dedup."""
+    return {tuple(row) for row in session.execute(select(Bookmark.topic_id, Bookmark.url))}
+
+
+def insert_bookmark_rows(session, rows):
+    """Bulk-insert bookmark row dicts; the unique (topic_id, url) index
+    absorbs any residual collisions via INSERT OR IGNORE."""
+    if rows:
+        session.execute(insert(Bookmark).prefix_with("OR IGNORE"), rows)
+
+
 @app.post("/import")
 def import_bookmarks(file: UploadFile, request: Request, session=Depends(get_session)):
+    invalidate_cache()
     try:
         html = file.file.read().decode("utf-8", errors="ignore")
-        items = parse_bookmarks_html(html)
-
-        created = 0
+        items = list(parse_bookmarks_html(html))  # iterated twice below
+
+        # preload existing (topic_id, url) pairs once instead of one SELECT per row
+        existing = load_existing_bookmark_keys(session)
+        topic_cache = load_topic_cache(session)
+        # resolve each distinct folder path once; sibling bookmarks share tuples
+        topic_ids = {}
+        with session.no_autoflush:
+            for path, _, _ in items:
+                if path not in topic_ids:
+                    topic_ids[path] = ensure_topic_path(session, path, topic_cache)
+        rows = []
         skipped = 0
-        seen_keys = set()  # avoid duplicates within the same upload batch
-        for path, title, href in items:
-            parent = ensure_topic_path(session, path)
-            url_value = (href or "").strip()
-            key = (parent.id, url_value)
-            if key in seen_keys:
-                skipped += 1
-                continue
-            # skip duplicates already in DB
-            exists = session.execute(
-                select(Bookmark.id).where(Bookmark.topic_id == parent.id, Bookmark.url == url_value)
-            ).first()
-            if exists:
+        for row in iter_bookmark_rows(items, topic_ids):
+            key = (row["topic_id"], row["url"])
+            if key in existing:
                 skipped += 1
                 continue
-            session.add(Bookmark(title=(title or url_value).strip(), url=url_value, topic_id=parent.id))
-            seen_keys.add(key)
-            created += 1
+            rows.append(row)
+            existing.add(key)
+        insert_bookmark_rows(session, rows)
         session.commit()
 
-        return RedirectResponse(url=f"/?imported={created}&skipped={skipped}", status_code=303)
+        return RedirectResponse(url=f"/?imported={len(rows)}&skipped={skipped}", status_code=303)
     except Exception as e:
         # Roll back any partial changes and show a helpful error
         try:
@@ -315,61 +600,58 @@ def import_bookmarks(file: UploadFile, request: Request, session=Depends(get_ses
 
 @app.post("/import_csv")
 def import_csv(file: UploadFile, session=Depends(get_session)):
+    invalidate_cache()
     text = file.file.read().decode("utf-8", errors="ignore")
-    reader = csv.DictReader(io.StringIO(text))
-    created = 0
+    reader = csv.reader(io.StringIO(text))
+    header = next(reader, None) or []
+    col = {name.strip().lower(): i for i, name in enumerate(header)}
+    path_i, title_i, url_i = col.get("topic_path"), col.get("title"), col.get("url")
+
+    def cell(row, i):
+        return row[i].strip() if i is not None and i < len(row) else ""
+
+    existing = load_existing_bookmark_keys(session)
+    topic_cache = load_topic_cache(session)
+    rows = []
     skipped = 0
-    seen_keys = set()
-    for row in reader:
-        path_str = (row.get("topic_path") or "").strip()
-        path = [p for p in path_str.split("/") if p]
-        title = (row.get("title") or "").strip()
-        url_value = (row.get("url") or "").strip()
-        if not url_value:
-            continue
-        parent = ensure_topic_path(session, path)
-        key = (parent.id, url_value)
-        if key in seen_keys:
-            skipped += 1
-            continue
-        exists = session.execute(
-            select(Bookmark.id).where(Bookmark.topic_id == parent.id, Bookmark.url == url_value)
-        ).first()
-        if exists:
-            skipped += 1
-            continue
-        session.add(Bookmark(title=title or url_value, url=url_value, topic_id=parent.id))
-        seen_keys.add(key)
-        created += 1
+    with session.no_autoflush:
+        for row in reader:
+            url_value = cell(row, url_i)
+            if not url_value:
+                continue
+            path = [p for p in cell(row, path_i).split("/") if p]
+            parent_id = ensure_topic_path(session, path, topic_cache)
+            key = (parent_id, url_value)
+            if key in existing:
+                skipped += 1
+                continue
+            rows.append({"title": cell(row, title_i) or url_value, "url": url_value, "topic_id": parent_id})
+            existing.add(key)
+    insert_bookmark_rows(session, rows)
     session.commit()
-    return RedirectResponse(url=f"/?imported={created}&skipped={skipped}", status_code=303)
+    return RedirectResponse(url=f"/?imported={len(rows)}&skipped={skipped}", status_code=303)
 
 
 @app.post("/import_json")
 def import_json(file: UploadFile, session=Depends(get_session)):
-    data = json.loads(file.file.read().decode("utf-8", errors="ignore") or "[]")
-    created = 0
+    invalidate_cache()
+    data = orjson.loads(file.file.read() or b"[]")
+    existing = load_existing_bookmark_keys(session)
+    topic_cache = load_topic_cache(session)
+    rows = []
     skipped = 0
-    seen_keys = set()
 
     def add_item(path, title, url_value):
-        nonlocal created, skipped
+        nonlocal skipped
         if not url_value:
             return
-        parent = ensure_topic_path(session, path)
-        key = (parent.id, url_value)
-        if key in seen_keys:
+        parent_id = ensure_topic_path(session, path, topic_cache)
+        key = (parent_id, url_value)
+        if key in existing:
             skipped += 1
             return
-        exists = session.execute(
-            select(Bookmark.id).where(Bookmark.topic_id == parent.id, Bookmark.url == url_value)
-        ).first()
-        if exists:
-            skipped += 1
-            return
-        session.add(Bookmark(title=title or url_value, url=url_value, topic_id=parent.id))
-        seen_keys.add(key)
-        created += 1
+        rows.append({"title": title or url_value, "url": url_value, "topic_id": parent_id})
+        existing.add(key)
 
     # Support two formats: flat rows and tree from export.json
     if isinstance(data, list):
@@ -389,25 +671,26 @@ def import_json(file: UploadFile, session=Depends(get_session)):
                 path_str = (row.get("topic_path") or "").strip()
                 path = [p for p in path_str.split("/") if p]
                 add_item(path, (row.get("title") or "").strip(), (row.get("url") or "").strip())
+    insert_bookmark_rows(session, rows)
     session.commit()
-    return RedirectResponse(url=f"/?imported={created}&skipped={skipped}", status_code=303)
+    return RedirectResponse(url=f"/?imported={len(rows)}&skipped={skipped}", status_code=303)
 
 
 @app.get("/check")
-def check_url(url: str):
+async def check_url(url: str, request: Request):
     """Basic health check for a URL; tries HEAD, falls back to GET."""
+    client = request.app.state.http
     timeout = httpx.Timeout(5.0, connect=5.0)
     status = None
     ok = False
     try:
-        with httpx.Client(timeout=timeout, follow_redirects=True) as client:
-            r = client.head(url)
+        r = await client.head(url, timeout=timeout)
+        status = r.status_code
+        ok = 200 <= status < 400
+        if not ok:
+            r = await client.get(url, timeout=timeout)
             status = r.status_code
             ok = 200 <= status < 400
-            if not ok:
-                r = client.get(url)
-                status = r.status_code
-                ok = 200 <= status < 400
     except Exception:
         status = None
         ok = False
@@ -464,12 +747,13 @@ def _preview_fallback(url: str, message: str) -> HTMLResponse:
 
 
 @app.get("/preview", response_class=HTMLResponse)
-def preview(url: str):
+async def preview(url: str, request: Request):
     """Server-side preview that works for sites blocking iframes.
     - YouTube watch links → embed player
     - GitHub repo links → render README.md
     - Fallback: simple fetch and strip scripts; show title + limited content
     """
+    client = request.app.state.http
     try:
         parsed = urllib.parse.urlsplit(url)
         host = (parsed.hostname or "").lower()
@@ -500,13 +784,18 @@ def preview(url: str):
                     f"https://raw.githubusercontent.com/{owner}/{repo}/main/README.md",
                     f"https://raw.githubusercontent.com/{owner}/{repo}/master/README.md",
                 ]
-                md = None
-                with httpx.Client(timeout=10) as client:
-                    for raw in raw_candidates:
-                        r = client.get(raw)
-                        if r.status_code == 200 and r.text.strip():
-                            md = r.text
-                            break
+                # try all branch candidates concurrently, keep the first hit
+                results = await asyncio.gather(
+                    *(client.get(raw) for raw in raw_candidates), return_exceptions=True
+                )
+                md = next(
+                    (
+                        r.text
+                        for r in results
+                        if isinstance(r, httpx.Response) and r.status_code == 200 and r.text.strip()
+                    ),
+                    None,
+                )
                 if md:
                     html = markdown2.markdown(md)
                     title = f"{owner}/{repo} — README"
@@ -517,29 +806,27 @@ def preview(url: str):
                     )
 
         # Generic fetch and sanitize
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Accept-Language": "en-US,en;q=0.5",
-        }
-        with httpx.Client(timeout=10, follow_redirects=True, headers=headers) as client:
-            r = client.get(url)
+        r = await client.get(url)
 
         if r.status_code >= 400:
             return _preview_fallback(url, f"Saiti ei saanud laadida (HTTP staatus: {r.status_code}).")
 
-        soup = BeautifulSoup(r.text or "", "html.parser")
-        for tag in soup(["script", "noscript", "style", "iframe", "header", "footer", "nav"]):
+        tree = HTMLParser(r.text or "")
+        for tag in tree.css("script,noscript,style,iframe,header,footer,nav"):
             tag.decompose()
-        
-        title = soup.title.get_text(strip=True) if soup.title else url
-        body = soup.body or soup
-        
-        raw_text = (body.get_text(" ", strip=True) if body else "").lower()
-        if "attention required" in raw_text or "cloudflare" in raw_text and "blocked" in raw_text:
+
+        title_node = tree.css_first("title")
+        title = title_node.text(strip=True) if title_node else url
+        body = tree.body or tree.root
+
+        # Scan the cleaned body text, not the raw HTML: script/style URLs
+        # (e.g. cdnjs.cloudflare.com includes) must not trip the detector.
+        raw_text = (body.text(separator=" ", strip=True) if body else "").lower()
+        hits = {v for _, v in _BLOCK_MARKERS.iter(raw_text)}
+        if "attention required" in hits or "cloudflare" in hits and "blocked" in hits:
             return _preview_fallback(url, "Sait kasutab Cloudflare'i või sarnast kaitset, mis takistab eelvaate kuvamist.")
 
-        content = "".join(str(el) for el in body.find_all(["h1", "h2", "h3", "p", "ul", "ol", "pre", "article", "main", "div"], limit=80))
+        content = "".join(n.html or "" for n in body.css("h1,h2,h3,p,ul,ol,pre,article,main,div")[:80])
         
         # Check if the extracted content is too short or meaningless
         if len(content.strip()) < 150:
@@ -556,61 +843,141 @@ def preview(url: str):
         return _preview_fallback(url, f"Ilmnes ootamatu viga: {type(e).__name__}.")
 
 
-@app.get("/export", response_class=HTMLResponse)
-def export_html(session=Depends(get_session)):
-    # Simple Netscape Bookmarks HTML
-    root_topics = session.execute(select(Topic).where(Topic.parent_id == None)).scalars().all()
-
-    def render_topic(t: Topic) -> str:
-        parts = [f"<DT><H3>{t.name}</H3>\n<DL><p>\n"]
-        for b in t.bookmarks:
-            parts.append(f"<DT><A HREF=\"{b.url}\">{b.title}</A>\n")
-        for c in t.children:
-            parts.append(render_topic(c))
-        parts.append("</DL><p>\n")
-        return "".join(parts)
-
-    body = [
-        "<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<META HTTP-EQUIV=\"Content-Type\" CONTENT=\"text/html; charset=UTF-8\">\n<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n"
-    ]
-    for r in root_topics:
-        body.append(render_topic(r))
-    body.append("</DL><p>\n")
+def load_export_topics(session):
+    """All topics in traversal_ids (depth-first) order plus a children map.
+
+    Parents sort before their descendants, so a DFS over the children map
+    visits topics in exactly the same order as the streamed bookmark query.
+    """
+    topics = session.execute(
+        select(Topic).options(raiseload("*")).order_by(Topic.traversal_ids)
+    ).scalars().all()
+    children_by_parent = {}
+    for t in topics:
+        children_by_parent.setdefault(t.parent_id, []).append(t)
+    return topics, children_by_parent
+
+
+def stream_bookmarks_in_topic_order(session, batch_size=1000):
+    """Bookmarks ordered by their topic's traversal_ids, fetched in batches."""
+    return iter(
+        session.execute(
+            select(Bookmark)
+            .join(Topic, Bookmark.topic_id == Topic.id)
+            .options(raiseload("*"))
+            .order_by(Topic.traversal_ids, Bookmark.id)
+            .execution_options(yield_per=batch_size)
+        ).scalars()
+    )
 
-    return HTMLResponse(content="".join(body), media_type="text/html")
+
+@app.get("/export", response_class=HTMLResponse)
+def export_html():
+    # Simple Netscape Bookmarks HTML, streamed folder by folder.
+    # The request-scoped session is released before the body streams,
+    # so the generator owns its own session.
+    def gen():
+        session = session_factory()
+        try:
+            topics, children_by_parent = load_export_topics(session)
+            bookmarks = stream_bookmarks_in_topic_order(session)
+            pending = [next(bookmarks, None)]
+
+            def walk(t: Topic):
+                yield f"<DT><H3>{t.name}</H3>\n<DL><p>\n"
+                while pending[0] is not None and pending[0].topic_id == t.id:
+                    b = pending[0]
+                    yield f"<DT><A HREF=\"{b.url}\">{b.title}</A>\n"
+                    pending[0] = next(bookmarks, None)
+                for c in children_by_parent.get(t.id, []):
+                    yield from walk(c)
+                yield "</DL><p>\n"
+
+            yield (
+                "<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<META HTTP-EQUIV=\"Content-Type\" "
+                "CONTENT=\"text/html; charset=UTF-8\">\n<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n"
+            )
+            for r in children_by_parent.get(None, []):
+                yield from walk(r)
+            yield "</DL><p>\n"
+        finally:
+            session.close()
+
+    return StreamingResponse(gen(), media_type="text/html")
 
 
 @app.get("/export.json")
-def export_json(session=Depends(get_session)):
-    import json
-    def serialize_topic(t: Topic):
-        return {
-            "id": t.id,
-            "name": t.name,
-            "bookmarks": [{"id": b.id, "title": b.title, "url": b.url} for b in t.bookmarks],
-            "children": [serialize_topic(c) for c in t.children],
-        }
-    roots = session.execute(select(Topic).where(Topic.parent_id == None)).scalars().all()
-    data = [serialize_topic(r) for r in roots]
-    return HTMLResponse(json.dumps(data, ensure_ascii=False, indent=2), media_type="application/json")
+def export_json():
+    def gen():
+        session = session_factory()
+        try:
+            topics, children_by_parent = load_export_topics(session)
+            bookmarks = stream_bookmarks_in_topic_order(session)
+            pending = [next(bookmarks, None)]
+
+            def walk(t: Topic):
+                yield '{"id": %d, "name": %s, "bookmarks": [' % (
+                    t.id,
+                    orjson.dumps(t.name).decode(),
+                )
+                first = True
+                while pending[0] is not None and pending[0].topic_id == t.id:
+                    b = pending[0]
+                    if not first:
+                        yield ", "
+                    yield orjson.dumps(
+                        {"id": b.id, "title": b.title, "url": b.url}
+                    ).decode()
+                    first = False
+                    pending[0] = next(bookmarks, None)
+                yield '], "children": ['
+                for i, c in enumerate(children_by_parent.get(t.id, [])):
+                    if i:
+                        yield ", "
+                    yield from walk(c)
+                yield "]}"
+
+            yield "["
+            for i, r in enumerate(children_by_parent.get(None, [])):
+                if i:
+                    yield ", "
+                yield from walk(r)
+            yield "]"
+        finally:
+            session.close()
+
+    return StreamingResponse(gen(), media_type="application/json")
 
 
 @app.get("/export.csv")
-def export_csv(session=Depends(get_session)):
-    import io, csv
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["topic_path", "title", "url"])
-    def walk(t: Topic, path):
-        p = path + [t.name]
-        for b in t.bookmarks:
-            writer.writerow(["/".join(p), b.title, b.url])
-        for c in t.children:
-            walk(c, p)
-    roots = session.execute(select(Topic).where(Topic.parent_id == None)).scalars().all()
-    for r in roots:
-        walk(r, [])
-    return HTMLResponse(output.getvalue(), media_type="text/csv")
+def export_csv():
+    def gen():
+        session = session_factory()
+        try:
+            topics, children_by_parent = load_export_topics(session)
+            # parents precede children in traversal order: paths resolve in one pass
+            paths = {}
+            for t in topics:
+                parent_path = paths.get(t.parent_id, "")
+                paths[t.id] = f"{parent_path}/{t.name}" if parent_path else t.name
+
+            out = io.StringIO()
+            writer = csv.writer(out)
+
+            def emit(row):
+                writer.writerow(row)
+                chunk = out.getvalue()
+                out.seek(0)
+                out.truncate(0)
+                return chunk
+
+            yield emit(["topic_path", "title", "url"])
+            for b in stream_bookmarks_in_topic_order(session):
+                yield emit([paths.get(b.topic_id, ""), b.title, b.url])
+        finally:
+            session.close()
+
+    return StreamingResponse(gen(), media_type="text/csv")
 
 
 @app.get("/sample.csv")
@@ -629,12 +996,16 @@ def sample_json():
         {"topic_path": "AI Tools", "title": "Claude", "url": "https://claude.ai/"},
         {"topic_path": "Youtube AI", "title": "The AI Advantage - YouTube", "url": "https://www.youtube.com/@aiadvantage"}
     ]
-    return HTMLResponse(json.dumps(data, ensure_ascii=False, indent=2), media_type="application/json")
+    return Response(orjson.dumps(data, option=orjson.OPT_INDENT_2), media_type="application/json")
 
 
 @app.get("/backup")
 def backup_db():
     """Download current SQLite DB file."""
+    # Fold the WAL into the main file first, otherwise recent commits are
+    # missing from the downloaded copy.
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
     filename = f"bookmarks-backup.sqlite3"
     return FileResponse(os.path.abspath(DB_PATH), filename=filename, media_type="application/octet-stream")
 
@@ -642,61 +1013,79 @@ def backup_db():
 @app.post("/restore")
 def restore_db(file: UploadFile):
     """Restore SQLite DB from uploaded file (overwrites current DB)."""
-    data = file.file.read()
-    # basic safety: require non-empty
-    if not data:
-        return RedirectResponse(url="/", status_code=303)
+    global _ROOT_TOPIC_ID
+    invalidate_cache()
     target = os.path.abspath(DB_PATH)
     tmp = target + ".tmp"
+    # Stream the upload to disk in 1 MiB chunks instead of buffering the
+    # whole DB in memory; fsync before the atomic replace for durability.
     with open(tmp, "wb") as f:
-        f.write(data)
-    # simple check: file should be an SQLite header
+        shutil.copyfileobj(file.file, f, length=1024 * 1024)
+        f.flush()
+        os.fsync(f.fileno())
+    # simple check: file should be an SQLite header (and non-empty)
     with open(tmp, "rb") as f:
         head = f.read(16)
     if b"SQLite format 3" not in head:
         os.remove(tmp)
         return RedirectResponse(url="/", status_code=303)
+    # Quiesce SQLite before swapping files: checkpoint the WAL, drop every
+    # pooled connection and remove the stale sidecars, otherwise the
+    # restored file gets reassembled against the old journal and corrupts.
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    engine.dispose()
+    for sidecar in (target + "-wal", target + "-shm"):
+        try:
+            os.remove(sidecar)
+        except FileNotFoundError:
+            pass
     # replace
     os.replace(tmp, target)
+    # The restored backup may predate the current schema (FTS table,
+    # composite indexes, user_version stamp) — migrate it now rather than
+    # on the next process restart.
+    run_startup_migrations()
+    # The cached root id may point at a different topic in the restored DB
+    _ROOT_TOPIC_ID = None
     return RedirectResponse(url="/", status_code=303)
 
 
 # Duplicates
 @app.get("/duplicates", response_class=HTMLResponse)
+@cache(expire=60, key_builder=no_db_session_key_builder)
 def view_duplicates(request: Request, session=Depends(get_session)):
-    # Find URLs that are duplicated
-    duplicate_urls_query = (
+    # One statement: join bookmarks against the URLs that occur more than
+    # once, instead of a separate duplicate-URL query plus a huge IN clause
+    dup_urls = (
         select(Bookmark.url)
         .group_by(Bookmark.url)
         .having(func.count(Bookmark.id) > 1)
-        .order_by(func.lower(Bookmark.url))
+        .cte("dup")
     )
-    duplicate_urls = session.execute(duplicate_urls_query).scalars().all()
+    all_bookmarks = session.execute(
+        select(Bookmark)
+        .join(dup_urls, Bookmark.url == dup_urls.c.url)
+        .options(selectinload(Bookmark.topic).raiseload("*"), raiseload("*"))  # Eager load topic to avoid N+1; anything else raises
+        .order_by(func.lower(Bookmark.url), Bookmark.id)
+    ).scalars().all()
 
-    # For each duplicate URL, get the full bookmark objects, including topic info
     duplicates_map = {}
-    if duplicate_urls:
-        # This is more efficient than N+1 queries in a loop
-        all_duplicates_query = (
-            select(Bookmark)
-            .where(Bookmark.url.in_(duplicate_urls))
-            .options(selectinload(Bookmark.topic)) # Eager load topic to avoid N+1
-            .order_by(Bookmark.url, Bookmark.id)
-        )
-        all_bookmarks = session.execute(all_duplicates_query).scalars().all()
-        for b in all_bookmarks:
-            if b.url not in duplicates_map:
-                duplicates_map[b.url] = []
-            duplicates_map[b.url].append(b)
+    for b in all_bookmarks:
+        duplicates_map.setdefault(b.url, []).append(b)
 
+    # preload the sidebar tree so the template never lazy-loads children
+    root = get_root_topic(session)
+    topics_by_id, _children = load_topic_tree(session, root.id)
     return templates.TemplateResponse(
         "duplicates.html",
-        {"request": request, "duplicates": duplicates_map, "root": get_root_topic(session)},
+        {"request": request, "duplicates": duplicates_map, "root": topics_by_id[root.id]},
     )
 
 
 @app.post("/duplicates/delete")
 def delete_duplicates(delete_ids: List[int] = Form(...), session=Depends(get_session)):
+    invalidate_cache()
     if delete_ids:
         # Make sure we don't have empty strings if form is weird
         id_list = [int(id) for id in delete_ids if str(id).isdigit()]
@@ -1,15 +1,26 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index, event, select, update
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime
 from .db import Base
 
 
 class Topic(Base):
     __tablename__ = "topics"
+    # Composite index serves both "children of parent" scans and the
+    # per-level (parent_id, name) lookup during import path resolution.
+    # Not unique: duplicate sibling names are allowed (as they always were
+    # via /topics/create and /topics/move).
+    __table_args__ = (
+        Index("ix_topics_parent_name", "parent_id", "name"),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(255), nullable=False)
-    parent_id = Column(Integer, ForeignKey("topics.id"), nullable=True, index=True)
+    parent_id = Column(Integer, ForeignKey("topics.id"), nullable=True)
+    # Materialized ancestor path like "/1/7/23/"; lets subtree and ancestor
+    # checks run as a single indexed prefix match instead of recursion.
+    traversal_ids = Column(String(255), nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     parent = relationship("Topic", remote_side=[id], backref="children")
@@ -18,8 +29,28 @@ class Topic(Base):
     )
 
 
+@event.listens_for(Topic, "after_insert")
+def _set_topic_traversal_ids(mapper, connection, target):
+    """Fill traversal_ids once the autoincrement id is known."""
+    if target.parent_id is None:
+        path = f"/{target.id}/"
+    else:
+        parent_path = connection.execute(
+            select(Topic.traversal_ids).where(Topic.id == target.parent_id)
+        ).scalar() or f"/{target.parent_id}/"
+        path = f"{parent_path}{target.id}/"
+    connection.execute(
+        update(Topic).where(Topic.id == target.id).values(traversal_ids=path)
+    )
+    set_committed_value(target, "traversal_ids", path)
+
+
 class Bookmark(Base):
     __tablename__ = "bookmarks"
+    # (topic_id, id) makes id-ordered topic listings an index-only walk.
+    __table_args__ = (
+        Index("ix_bookmarks_topic_id_id", "topic_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String(512), nullable=False)
@@ -27,7 +58,7 @@ class Bookmark(Base):
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    topic_id = Column(Integer, ForeignKey("topics.id"), index=True, nullable=False)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
     topic = relationship("Topic", back_populates="bookmarks")
 
 
@@ -1,41 +1,140 @@
-from bs4 import BeautifulSoup, Tag
-from typing import List, Tuple, Optional
+import re
+import sys
+from html import unescape
+from html.parser import HTMLParser
+from typing import Dict, Iterator, List, Optional, Tuple
 
 
-def parse_bookmarks_html(html: str) -> List[Tuple[List[str], str, str]]:
+# Machine-generated exports use a fixed line format, so one compiled regex
+# can sweep the whole document: alternative 1 matches links, alternative 2
+# folder headings, alternative 3 folder closes.
+_NETSCAPE_RE = re.compile(
+    r'<DT><A\s+HREF="([^"]*)"[^>]*>([^<]*)</A>'
+    r"|<DT><H3[^>]*>([^<]*)</H3>"
+    r"|</DL>",
+    re.IGNORECASE,
+)
+_LINK_RE = re.compile(r"<DT><A\b", re.IGNORECASE)
+
+
+class _BookmarkHTMLParser(HTMLParser):
+    """Streaming parser for Netscape bookmark exports.
+
+    The format is regular enough that no DOM is needed: an <H3> names the
+    folder opened by the <DL> that follows it, </DL> closes it, and
+    <A HREF=...> is a link. A folder stack maintained across the tag
+    callbacks replaces tree construction entirely.
     """
-    Parse Safari/Netscape Bookmarks HTML which typically uses <DL>/<DT>/<H3> for folders
-    and <DT><A ...> for links. Returns list of (path, title, href) where path is folder list.
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.results: List[Tuple[Tuple[str, ...], str, str]] = []
+        self.path: List[Optional[str]] = []
+        # Shared per folder state: every sibling anchor reuses this object
+        # instead of rebuilding the path from the stack per link.
+        self._current: Tuple[str, ...] = ()
+        self._pending_folder: Optional[str] = None
+        self._href: Optional[str] = None
+        self._buf: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            # attrs is a short list of pairs; scanning it beats building a
+            # throwaway dict per anchor.
+            href = None
+            for name, value in attrs:
+                if name == "href":
+                    href = value
+                    break
+            self._href = href
+            self._buf = []
+        elif tag == "h3":
+            self._buf = []
+        elif tag == "dl":
+            # The folder name was captured from the H3 preceding this DL;
+            # unnamed DLs (e.g. the top-level one) push None.
+            self.path.append(self._pending_folder)
+            self._pending_folder = None
+            self._current = tuple(p for p in self.path if p)
+
+    def handle_data(self, data):
+        if self._buf is not None:
+            self._buf.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a":
+            if self._href:
+                title = "".join(self._buf or []).strip() or self._href
+                self.results.append((self._current, title, self._href))
+            self._href = None
+            self._buf = None
+        elif tag == "h3":
+            name = "".join(self._buf or []).strip()
+            self._pending_folder = sys.intern(name) if name else None
+            self._buf = None
+        elif tag == "dl":
+            if self.path:
+                self.path.pop()
+                self._current = tuple(p for p in self.path if p)
+
+
+def _parse_fast(html: str) -> Optional[List[Tuple[Tuple[str, ...], str, str]]]:
+    """Regex sweep for well-formed exports; None if the format deviates.
+
+    Folder names push on their <H3> match and pop on </DL>; the unnamed
+    top-level DL never pushes, so its close is absorbed by the stack guard.
+    Anchors whose title nests markup (or uses single-quoted attributes)
+    escape the pattern, which the final link count check detects.
     """
-    soup = BeautifulSoup(html, "html.parser")
-    results: List[Tuple[List[str], str, str]] = []
-
-    def folder_name_for_dl(dl: Tag) -> Optional[str]:
-        """Find the H3 whose associated DL contains this dl (robust across <p> wrappers)."""
-        for h3 in dl.find_all_previous("h3"):
-            next_dl = h3.find_next("dl")
-            if isinstance(next_dl, Tag) and (next_dl is dl or dl in next_dl.descendants):
-                return h3.get_text(strip=True)
+    results: List[Tuple[Tuple[str, ...], str, str]] = []
+    emit = results.append  # hoisted: one attribute lookup saved per anchor
+    path: List[Optional[str]] = []
+    current: Tuple[str, ...] = ()
+    for m in _NETSCAPE_RE.finditer(html):
+        href, title, folder = m.group(1, 2, 3)
+        if href is not None:
+            href = unescape(href)
+            emit((current, unescape(title).strip() or href, href))
+        elif folder is not None:
+            name = unescape(folder).strip()
+            path.append(sys.intern(name) if name else None)
+            current = tuple(p for p in path if p)
+        elif path:
+            path.pop()
+            current = tuple(p for p in path if p)
+    if len(results) != len(_LINK_RE.findall(html)):
         return None
+    return results
 
-    def build_path_for_anchor(a: Tag) -> List[str]:
-        path: List[str] = []
-        dl = a.find_parent("dl")
-        while isinstance(dl, Tag):
-            name = folder_name_for_dl(dl)
-            if name:
-                path.insert(0, name)
-            dl = dl.find_parent("dl")
-        return path
-
-    for a in soup.find_all("a"):
-        if not a.has_attr("href"):
-            continue
-        title = a.get_text(strip=True) or a["href"]
-        href = a["href"]
-        path = build_path_for_anchor(a)
-        results.append((path, title, href))
 
-    return results
+def parse_bookmarks_html(html: str) -> Iterator[Tuple[Tuple[str, ...], str, str]]:
+    """
+    Parse Safari/Netscape Bookmarks HTML which typically uses <DL>/<DT>/<H3> for folders
+    and <DT><A ...> for links. Yields (path, title, href); path is a tuple of folder
+    names, shared between bookmarks in the same folder. Callers needing random access
+    can wrap in list().
+    """
+    if "NETSCAPE-Bookmark-file" in html[:512]:
+        results = _parse_fast(html)
+        if results is not None:
+            yield from results
+            return
+    parser = _BookmarkHTMLParser()
+    parser.feed(html)
+    parser.close()
+    yield from parser.results
 
 
+def iter_bookmark_rows(
+    items: List[Tuple[Tuple[str, ...], str, str]],
+    topic_ids: Dict[Tuple[str, ...], int],
+) -> Iterator[dict]:
+    """Yield bookmark row dicts ready for a bulk INSERT.
+
+    items is parse_bookmarks_html output and topic_ids maps each folder
+    path tuple to its resolved topic id, so the importer can hand the rows
+    straight to an executemany without building ORM objects.
+    """
+    for path, title, href in items:
+        url = (href or "").strip()
+        yield {"title": (title or url).strip(), "url": url, "topic_id": topic_ids[path]}